@@ -36,6 +36,8 @@ class Settings(BaseSettings):
     
     # Food Detection Model (fallback if Groq unavailable)
     FOOD_DETECTION_MODEL: str = "nateraw/food"
+    # torch.compile the fallback model (max-autotune); compiling adds minutes to the first load
+    ML_TORCH_COMPILE: bool = os.getenv("ML_TORCH_COMPILE", "False").lower() == "true"
     
     # File Upload
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10MB
@@ -44,6 +46,18 @@ class Settings(BaseSettings):
     # Digital Image Processing (DIP) Debug Mode
     DIP_DEBUG_MODE: bool = os.getenv("DIP_DEBUG_MODE", "True").lower() == "true"
     DIP_DEBUG_OUTPUT_DIR: str = os.getenv("DIP_DEBUG_OUTPUT_DIR", "dip_debug_output")
+    # Also save the raw LAB/HSV color-space images (not viewable as color photos)
+    DIP_SAVE_COLOR_SPACES: bool = os.getenv("DIP_SAVE_COLOR_SPACES", "False").lower() == "true"
+    # Non-local means denoising is by far the slowest DIP step; opt in for the full report
+    DIP_ENABLE_NLM: bool = os.getenv("DIP_ENABLE_NLM", "False").lower() == "true"
+    # Reuse DIP outputs for byte-identical re-uploads (cached under DIP_DEBUG_OUTPUT_DIR/.cache)
+    DIP_CACHE_ENABLED: bool = os.getenv("DIP_CACHE_ENABLED", "True").lower() == "true"
+    # DIP steps run on a copy no larger than this (pixels on the longest side)
+    DIP_WORKING_MAX_DIM: int = int(os.getenv("DIP_WORKING_MAX_DIM", "1024"))
+    # Render the radar-chart quality dashboard in the adaptive analysis (its metrics are in the JSON either way)
+    DIP_QUALITY_DASHBOARD: bool = os.getenv("DIP_QUALITY_DASHBOARD", "True").lower() == "true"
+    # Worker processes that render the adaptive-analysis figures in parallel; 1 renders them in the request thread
+    DIP_FIGURE_PROCESSES: int = int(os.getenv("DIP_FIGURE_PROCESSES", str(min(5, os.cpu_count() or 1))))
     
     class Config:
         env_file = ".env"
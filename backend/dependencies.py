@@ -0,0 +1,21 @@
+"""Shared service instances for FastAPI dependency injection"""
+from functools import lru_cache
+
+from services.nlp_service import NLPService
+from services.cv_service import CVService
+from services.analysis_service import AnalysisService
+
+@lru_cache(maxsize=1)
+def get_nlp_service() -> NLPService:
+    """NLP service (spaCy + sentiment model), created once per process"""
+    return NLPService()
+
+@lru_cache(maxsize=1)
+def get_cv_service() -> CVService:
+    """Computer vision service (food classifier + Groq vision), created once per process"""
+    return CVService()
+
+@lru_cache(maxsize=1)
+def get_analysis_service() -> AnalysisService:
+    """Correlation analysis service, created once per process"""
+    return AnalysisService()
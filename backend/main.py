@@ -7,6 +7,7 @@ import os
 
 from config import settings
 from database import init_db, get_db
+from dependencies import get_nlp_service, get_cv_service, get_analysis_service
 from routers import meals, symptoms, photos, analysis, users
 
 # Initialize FastAPI app
@@ -52,6 +53,12 @@ async def startup_event():
     db = next(get_db())
     initialize_gluten_database(db)
     print("✅ Gluten database initialized")
+    
+    # Warm up shared services so model loading happens before the first request
+    get_nlp_service()
+    get_cv_service()
+    get_analysis_service()
+    print("✅ Services initialized")
 
 @app.get("/")
 async def root():
@@ -1,5 +1,6 @@
 """SQLAlchemy database models"""
 from datetime import datetime
+from functools import cached_property
 from sqlalchemy import Column, Integer, String, Float, DateTime, Text, ForeignKey, Boolean, JSON
 from sqlalchemy.orm import relationship
 from database import Base
@@ -47,6 +48,11 @@ class Meal(Base):
     # Relationships
     user = relationship("User", back_populates="meals")
     photos = relationship("FoodPhoto", back_populates="meal")
+    
+    @cached_property
+    def short_description(self) -> str:
+        """Description truncated for timeline display (computed once per instance)"""
+        return (self.description or "")[:100]
 
 class Symptom(Base):
     """Symptom logging model"""
@@ -73,6 +79,11 @@ class Symptom(Base):
     
     # Relationships
     user = relationship("User", back_populates="symptoms")
+    
+    @cached_property
+    def short_description(self) -> str:
+        """Description truncated for timeline display (computed once per instance)"""
+        return (self.description or "")[:100]
 
 class FoodPhoto(Base):
     """Food photo model"""
@@ -3,20 +3,22 @@ from fastapi import APIRouter, Depends, Query, HTTPException
 from sqlalchemy.orm import Session
 from typing import List
 from datetime import datetime, timedelta
+from operator import attrgetter
 
 from database import get_db
 from models import Meal, Symptom, Report
 from schemas import CorrelationAnalysis, DashboardData, TimelineEntry, ReportResponse
 from services.analysis_service import AnalysisService
+from dependencies import get_analysis_service
 
 router = APIRouter()
-analysis_service = AnalysisService()
 
 @router.get("/dashboard", response_model=DashboardData)
 def get_dashboard(
     user_id: int = Query(1, description="User ID"),
     days: int = Query(14, description="Number of days to analyze"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    analysis_service: AnalysisService = Depends(get_analysis_service)
 ):
     """Get dashboard summary data"""
     try:
@@ -49,7 +51,8 @@ def get_correlation_analysis(
     user_id: int = Query(1, description="User ID"),
     start_date: datetime = Query(None),
     end_date: datetime = Query(None),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    analysis_service: AnalysisService = Depends(get_analysis_service)
 ):
     """Get correlation analysis between gluten and symptoms"""
     
@@ -127,7 +130,7 @@ def get_timeline(
         ))
     
     # Sort by timestamp
-    timeline.sort(key=lambda x: x.timestamp, reverse=True)
+    timeline.sort(key=attrgetter("timestamp"), reverse=True)
     
     return timeline
 
@@ -135,7 +138,8 @@ def get_timeline(
 def generate_report(
     user_id: int = Query(1, description="User ID"),
     weeks: int = Query(6, description="Number of weeks to analyze"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    analysis_service: AnalysisService = Depends(get_analysis_service)
 ):
     """Generate comprehensive analysis report"""
     end_date = datetime.utcnow()
@@ -3,19 +3,21 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, timedelta
+import time
 import traceback
 
 from database import get_db
-from models import Meal, User
+from models import Meal, User, GlutenDatabase
 from schemas import MealCreate, MealUpdate, MealResponse
 from services.nlp_service import NLPService
+from dependencies import get_nlp_service
 from services.gluten_db_service import get_gluten_risk_for_meal
 from groq import Groq
 from config import settings
 import re
+from string import Template
 
 router = APIRouter()
-nlp_service = NLPService()
 
 # Initialize Groq client for detailed descriptions
 _groq_client = None
@@ -28,26 +30,35 @@ if settings.GROQ_API_KEY:
 else:
     print("⚠️ GROQ_API_KEY not set - detailed meal descriptions will not be generated")
 
-def generate_meal_details_with_groq(description: str, foods: List[str], gluten_risk: float) -> Optional[str]:
-    """
-    Generate detailed meal description using Groq LLM
-    Includes gluten content, serving information, and health insights
-    Professional, formatted descriptions for timeline display
-    """
-    if not _groq_client or not foods:
-        return None
-    
-    try:
-        foods_str = ", ".join(foods)
-        primary_food = foods[0] if foods else "food"
-        
-        prompt = f"""You are a nutrition expert analyzing meals for a gluten tracking app.
+# Recoverable failures (Groq outage, NLP hiccups) repeat on every request, so
+# identical errors are only printed once per window and without a traceback
+_ERROR_LOG_WINDOW_SECONDS = 10.0
+_ERROR_LOG_MAX_SIGNATURES = 256
+_recent_errors = {}
+
+def _log_recoverable_error(message: str, error: Exception) -> None:
+    """Print a one-line error, suppressing repeats of the same signature"""
+    signature = (message, type(error).__name__, str(error))
+    now = time.monotonic()
+    last_seen = _recent_errors.get(signature)
+    if last_seen is not None and now - last_seen < _ERROR_LOG_WINDOW_SECONDS:
+        return
+    if len(_recent_errors) >= _ERROR_LOG_MAX_SIGNATURES:
+        _recent_errors.clear()
+    _recent_errors[signature] = now
+    print(f"{message}: {error}")
+
+# Meal detail prompt: only the head depends on the meal, the instructions and
+# examples are built once and shared by every request
+_MEAL_DETAILS_PROMPT_HEAD = Template('''You are a nutrition expert analyzing meals for a gluten tracking app.
 
-Meal Description: "{description}"
-Detected Foods: {foods_str}
-Gluten Risk Score: {gluten_risk}/100
+Meal Description: "$description"
+Detected Foods: $foods
+Gluten Risk Score: $gluten_risk/100
 
-Generate a PROFESSIONAL, DETAILED description (2-3 sentences) that includes:
+''')
+
+_MEAL_DETAILS_PROMPT_BODY = """Generate a PROFESSIONAL, DETAILED description (2-3 sentences) that includes:
 
 1. SERVING INFORMATION: Be specific (e.g., "One samosa serving contains approximately 2-3 grams of gluten" or "A typical serving of roti contains 4-5 grams of gluten")
 
@@ -78,10 +89,31 @@ For dal with rice (5/100):
 
 Respond with ONLY the description text, nothing else. No quotes, no formatting, just the plain text description."""
 
+_MEAL_DETAILS_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": "You are a professional nutritionist and food safety expert providing detailed, accurate food analysis for a medical-grade gluten tracking application."
+}
+
+def generate_meal_details_with_groq(description: str, foods: List[str], gluten_risk: float) -> Optional[str]:
+    """
+    Generate detailed meal description using Groq LLM
+    Includes gluten content, serving information, and health insights
+    Professional, formatted descriptions for timeline display
+    """
+    if not _groq_client or not foods:
+        return None
+    
+    try:
+        prompt = _MEAL_DETAILS_PROMPT_HEAD.substitute(
+            description=description,
+            foods=", ".join(foods),
+            gluten_risk=gluten_risk
+        ) + _MEAL_DETAILS_PROMPT_BODY
+
         response = _groq_client.chat.completions.create(
             model="llama-3.1-8b-instant",
             messages=[
-                {"role": "system", "content": "You are a professional nutritionist and food safety expert providing detailed, accurate food analysis for a medical-grade gluten tracking application."},
+                _MEAL_DETAILS_SYSTEM_MESSAGE,
                 {"role": "user", "content": prompt}
             ],
             max_tokens=250,
@@ -103,16 +135,15 @@ Respond with ONLY the description text, nothing else. No quotes, no formatting,
             return None
         
     except Exception as e:
-        import traceback
-        print(f"⚠️ Groq detail generation error: {e}")
-        print(traceback.format_exc())
+        _log_recoverable_error("⚠️ Groq detail generation error", e)
         return None
 
 @router.post("/", response_model=MealResponse, status_code=201)
 def create_meal(
     meal_data: MealCreate,
     user_id: int = Query(1, description="User ID"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    nlp_service: NLPService = Depends(get_nlp_service)
 ):
     """Log a new meal"""
     
@@ -138,9 +169,7 @@ def create_meal(
         try:
             foods_list = nlp_service.extract_food_entities(meal_data.description)
         except Exception as e:
-            import traceback
-            print(f"⚠️ NLP extraction failed: {e}")
-            print(traceback.format_exc())
+            _log_recoverable_error("⚠️ NLP extraction failed", e)
             # Fallback: use description as food if NLP fails
             foods_list = [meal_data.description.lower()] if meal_data.description else []
         
@@ -157,29 +186,27 @@ def create_meal(
         # Calculate gluten risk (using food names)
         try:
             gluten_info = get_gluten_risk_for_meal(foods_list, db)
-            # Update gluten risk in food dicts
+            # Update gluten risk in food dicts, fetching the reference table
+            # once (and only when there is something to look up) instead of
+            # one or two queries per food
+            gluten_items = db.query(GlutenDatabase).all() if foods_dicts else []
+            gluten_items_by_name = {item.food_name: item for item in gluten_items}
             for food_dict in foods_dicts:
                 food_name = food_dict["name"]
                 # Get gluten risk for this specific food
-                from services.gluten_db_service import GLUTEN_DATABASE
-                from models import GlutenDatabase
-                food_item = db.query(GlutenDatabase).filter(
-                    GlutenDatabase.food_name == food_name.lower()
-                ).first()
+                food_item = gluten_items_by_name.get(food_name.lower())
                 if food_item:
                     food_dict["gluten_risk"] = food_item.gluten_risk
                 else:
                     # Try partial match
-                    for item in db.query(GlutenDatabase).all():
+                    for item in gluten_items:
                         if item.food_name in food_name.lower() or food_name.lower() in item.food_name:
                             food_dict["gluten_risk"] = item.gluten_risk
                             break
                     else:
                         food_dict["gluten_risk"] = 30  # Default
         except Exception as e:
-            import traceback
-            print(f"⚠️ Gluten risk calculation failed: {e}")
-            print(traceback.format_exc())
+            _log_recoverable_error("⚠️ Gluten risk calculation failed", e)
             # Fallback: default risk
             gluten_info = {
                 "gluten_risk_score": 30.0,
@@ -200,9 +227,7 @@ def create_meal(
                 else:
                     print("⚠️ Groq returned empty description")
             except Exception as e:
-                import traceback
-                print(f"⚠️ Groq detail generation failed: {e}")
-                print(traceback.format_exc())
+                _log_recoverable_error("⚠️ Groq detail generation failed", e)
         elif not _groq_client:
             print("⚠️ Groq client not available - detailed descriptions disabled")
         
@@ -315,7 +340,8 @@ def get_meal(meal_id: int, db: Session = Depends(get_db)):
 def update_meal(
     meal_id: int,
     meal_data: MealUpdate,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    nlp_service: NLPService = Depends(get_nlp_service)
 ):
     """Update an existing meal"""
     meal = db.query(Meal).filter(Meal.id == meal_id).first()
@@ -332,18 +358,14 @@ def update_meal(
             try:
                 foods_list = nlp_service.extract_food_entities(description_to_analyze)
             except Exception as e:
-                import traceback
-                print(f"⚠️ NLP extraction failed: {e}")
-                print(traceback.format_exc())
+                _log_recoverable_error("⚠️ NLP extraction failed", e)
                 foods_list = [description_to_analyze.lower()] if description_to_analyze else []
             
             # Calculate gluten risk
             try:
                 gluten_info = get_gluten_risk_for_meal(foods_list, db)
             except Exception as e:
-                import traceback
-                print(f"⚠️ Gluten risk calculation failed: {e}")
-                print(traceback.format_exc())
+                _log_recoverable_error("⚠️ Gluten risk calculation failed", e)
                 gluten_info = {
                     "gluten_risk_score": meal.gluten_risk_score,
                     "contains_gluten": meal.contains_gluten,
@@ -360,7 +382,7 @@ def update_meal(
                         gluten_info["gluten_risk_score"]
                     )
                 except Exception as e:
-                    print(f"⚠️ Groq detail generation failed: {e}")
+                    _log_recoverable_error("⚠️ Groq detail generation failed", e)
             
             # Update meal with new analysis
             meal.description = description_to_analyze
@@ -444,7 +466,8 @@ def delete_meal(meal_id: int, db: Session = Depends(get_db)):
 def generate_descriptions_for_existing_meals(
     user_id: int = Query(1, description="User ID"),
     limit: int = Query(50, description="Number of meals to process"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    nlp_service: NLPService = Depends(get_nlp_service)
 ):
     """Generate detailed descriptions for existing meals that don't have them"""
     if not _groq_client:
@@ -486,7 +509,7 @@ def generate_descriptions_for_existing_meals(
             else:
                 failed += 1
         except Exception as e:
-            print(f"⚠️ Failed to generate description for meal {meal.id}: {e}")
+            _log_recoverable_error("⚠️ Failed to generate meal description", e)
             failed += 1
     
     db.commit()
@@ -1,7 +1,7 @@
 """Food photo upload and detection endpoints"""
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 import os
 import uuid
 from datetime import datetime
@@ -10,18 +10,20 @@ from database import get_db
 from models import FoodPhoto, Meal
 from schemas import FoodPhotoResponse, MealResponse
 from services.cv_service import CVService
+from dependencies import get_cv_service
 from services.gluten_db_service import get_gluten_risk_for_meal
 from config import settings
 
 router = APIRouter()
-cv_service = CVService()
 
 @router.post("/upload", response_model=FoodPhotoResponse, status_code=201)
 async def upload_food_photo(
     file: UploadFile = File(...),
     user_id: int = Query(1, description="User ID"),
     create_meal: bool = Query(True, description="Auto-create meal from photo"),
-    db: Session = Depends(get_db)
+    generate_dip_output: Optional[bool] = Query(None, description="Write the DIP report images (defaults to DIP_DEBUG_MODE)"),
+    db: Session = Depends(get_db),
+    cv_service: CVService = Depends(get_cv_service)
 ):
     """Upload and analyze a food photo"""
     
@@ -72,7 +74,7 @@ async def upload_food_photo(
         # Process image with CV service
         try:
             start_time = datetime.utcnow()
-            detection_result = cv_service.detect_food(filepath)
+            detection_result = cv_service.detect_food(filepath, generate_dip_output=generate_dip_output)
             processing_time = (datetime.utcnow() - start_time).total_seconds()
         except Exception as e:
             import traceback
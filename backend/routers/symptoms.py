@@ -1,50 +1,104 @@
 """Symptom logging endpoints"""
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
 
 from database import get_db
 from models import Symptom
 from schemas import SymptomCreate, SymptomResponse
 from services.nlp_service import NLPService
+from dependencies import get_nlp_service
 
 router = APIRouter()
-nlp_service = NLPService()
+
+# Dedicated pool for NLP inference so model calls never run on the event loop
+_NLP_POOL = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1), thread_name_prefix="nlp")
+
+def _symptom_fields(symptom_data: SymptomCreate, user_id: int, nlp_result: dict) -> dict:
+    """Column values for a new symptom row"""
+    # Use provided severity or extracted severity
+    severity = symptom_data.severity if symptom_data.severity is not None else nlp_result["severity"]
+    
+    return {
+        "user_id": user_id,
+        "description": symptom_data.description,
+        "severity": severity,
+        "timestamp": symptom_data.timestamp or datetime.utcnow(),
+        "input_method": symptom_data.input_method,
+        "raw_text": symptom_data.description,
+        "symptom_type": nlp_result["symptom_type"],
+        "extracted_symptoms": nlp_result["extracted_symptoms"],
+        "sentiment_score": nlp_result["sentiment_score"],
+        "time_context": nlp_result["time_context"]
+    }
+
+def _insert_symptom(db: Session, fields: dict) -> SymptomResponse:
+    """Insert one symptom row and commit (blocking DB work, run off the event loop)"""
+    # INSERT ... RETURNING hands back defaulted columns (id, created_at),
+    # so no follow-up SELECT is needed
+    db_symptom = db.scalars(insert(Symptom).returning(Symptom), [fields]).one()
+    # Serialize before commit: commit expires the instance and would reload it
+    response = SymptomResponse.model_validate(db_symptom)
+    db.commit()
+    return response
+
+def _insert_symptoms(db: Session, rows: List[dict]) -> List[SymptomResponse]:
+    """Insert several symptom rows in one statement and commit (blocking DB work, run off the event loop)"""
+    db_symptoms = db.scalars(
+        insert(Symptom).returning(Symptom, sort_by_parameter_order=True), rows
+    ).all()
+    response = [SymptomResponse.model_validate(db_symptom) for db_symptom in db_symptoms]
+    db.commit()
+    return response
 
 @router.post("/", response_model=SymptomResponse, status_code=201)
-def create_symptom(
+async def create_symptom(
     symptom_data: SymptomCreate,
     user_id: int = Query(1, description="User ID"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    nlp_service: NLPService = Depends(get_nlp_service)
 ):
     """Log a new symptom"""
     
     # Extract symptom information using NLP
-    nlp_result = nlp_service.analyze_symptom(symptom_data.description)
-    
-    # Use provided severity or extracted severity
-    severity = symptom_data.severity if symptom_data.severity is not None else nlp_result["severity"]
+    loop = asyncio.get_running_loop()
+    nlp_result = await loop.run_in_executor(
+        _NLP_POOL, nlp_service.analyze_symptom, symptom_data.description
+    )
     
-    # Create symptom record
-    db_symptom = Symptom(
-        user_id=user_id,
-        description=symptom_data.description,
-        severity=severity,
-        timestamp=symptom_data.timestamp or datetime.utcnow(),
-        input_method=symptom_data.input_method,
-        raw_text=symptom_data.description,
-        symptom_type=nlp_result["symptom_type"],
-        extracted_symptoms=nlp_result["extracted_symptoms"],
-        sentiment_score=nlp_result["sentiment_score"],
-        time_context=nlp_result["time_context"]
+    # The insert and commit block, so they run in the threadpool like a sync endpoint's would
+    return await run_in_threadpool(
+        _insert_symptom, db, _symptom_fields(symptom_data, user_id, nlp_result)
     )
+
+@router.post("/bulk", response_model=List[SymptomResponse], status_code=201)
+async def create_symptoms_bulk(
+    symptoms_data: List[SymptomCreate],
+    user_id: int = Query(1, description="User ID"),
+    db: Session = Depends(get_db),
+    nlp_service: NLPService = Depends(get_nlp_service)
+):
+    """Log several symptoms with a single INSERT"""
+    if not symptoms_data:
+        return []
     
-    db.add(db_symptom)
-    db.commit()
-    db.refresh(db_symptom)
+    loop = asyncio.get_running_loop()
+    nlp_results = await asyncio.gather(*[
+        loop.run_in_executor(_NLP_POOL, nlp_service.analyze_symptom, symptom_data.description)
+        for symptom_data in symptoms_data
+    ])
     
-    return db_symptom
+    # The batch insert and commit block, so they run in the threadpool too
+    return await run_in_threadpool(_insert_symptoms, db, [
+        _symptom_fields(symptom_data, user_id, nlp_result)
+        for symptom_data, nlp_result in zip(symptoms_data, nlp_results)
+    ])
 
 @router.get("/", response_model=List[SymptomResponse])
 def get_symptoms(
@@ -0,0 +1,115 @@
+"""Correlation kernels for the analysis service
+
+best_lag is JIT-compiled with numba when it is installed; otherwise the
+NumPy implementation is used.
+"""
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+def _best_lag_numpy(g: np.ndarray, s: np.ndarray, max_lag: int) -> tuple:
+    """
+    Strongest Pearson correlation between g[:n-lag] and s[lag:] for
+    lag = 0..max_lag. Returns (correlation, lag); constant windows count as 0.
+
+    Window sums and sums of squares come from prefix sums, so only the cross
+    products need one dot product per lag.
+    """
+    n = g.shape[0]
+    lags = np.arange(max_lag + 1)
+    m = n - lags
+
+    # Shift by the global means to keep the sum-of-squares formula well conditioned
+    x = g - g.mean()
+    y = s - s.mean()
+    cx = np.concatenate(([0.0], np.cumsum(x)))
+    cxx = np.concatenate(([0.0], np.cumsum(x * x)))
+    cy = np.concatenate(([0.0], np.cumsum(y)))
+    cyy = np.concatenate(([0.0], np.cumsum(y * y)))
+
+    # x window is x[0:m], y window is y[lag:n]
+    sx = cx[m]
+    sxx = cxx[m]
+    sy = cy[n] - cy[lags]
+    syy = cyy[n] - cyy[lags]
+    sxy = np.array([x[:n - lag] @ y[lag:] for lag in lags])
+
+    # A window is constant when no adjacent values differ inside it
+    g_changes = np.concatenate(([0], np.cumsum(g[1:] != g[:-1])))
+    s_changes = np.concatenate(([0], np.cumsum(s[1:] != s[:-1])))
+    constant = (g_changes[m - 1] == 0) | (s_changes[n - 1] - s_changes[lags] == 0)
+
+    cov = m * sxy - sx * sy
+    var_x = m * sxx - sx * sx
+    var_y = m * syy - sy * sy
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = np.clip(cov / np.sqrt(var_x * var_y), -1.0, 1.0)
+    corr[constant | ~np.isfinite(corr)] = 0.0
+
+    # argmax keeps the earliest lag on ties, like a strict > scan
+    best = int(np.argmax(np.abs(corr)))
+    return float(corr[best]), best
+
+
+def _best_lag_fused(g, s, max_lag):
+    """
+    Same contract as _best_lag_numpy, written as scalar loops for numba:
+    one pass per lag for the window means (and constant check), one pass
+    accumulating the centered cross/auto products
+    """
+    n = g.shape[0]
+    best_corr = 0.0
+    best_lag = 0
+
+    for lag in range(max_lag + 1):
+        m = n - lag
+        s1 = 0.0
+        s2 = 0.0
+        g_min = g[0]
+        g_max = g[0]
+        s_min = s[lag]
+        s_max = s[lag]
+        for i in range(m):
+            a = g[i]
+            b = s[i + lag]
+            s1 += a
+            s2 += b
+            g_min = min(g_min, a)
+            g_max = max(g_max, a)
+            s_min = min(s_min, b)
+            s_max = max(s_max, b)
+        if g_min == g_max or s_min == s_max:
+            continue
+
+        mean1 = s1 / m
+        mean2 = s2 / m
+        ss1 = 0.0
+        ss2 = 0.0
+        s12 = 0.0
+        for i in range(m):
+            a = g[i] - mean1
+            b = s[i + lag] - mean2
+            ss1 += a * a
+            ss2 += b * b
+            s12 += a * b
+
+        corr = s12 / np.sqrt(ss1 * ss2)
+        corr = max(min(corr, 1.0), -1.0)
+        if abs(corr) > abs(best_corr):
+            best_corr = corr
+            best_lag = lag
+
+    return best_corr, best_lag
+
+
+if NUMBA_AVAILABLE:
+    best_lag = njit(cache=True, fastmath=True)(_best_lag_fused)
+    # Compile now rather than on the first correlation request
+    best_lag(np.zeros(3), np.zeros(3), 0)
+else:
+    best_lag = _best_lag_numpy
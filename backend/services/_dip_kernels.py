@@ -0,0 +1,149 @@
+"""Per-pixel kernels for the DIP pipeline
+
+lbp_histogram and block_ssim are JIT-compiled with numba when it is
+installed; otherwise the NumPy implementations are used.
+"""
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Neighbour offsets (dy, dx) for LBP bits 0-7, clockwise from top-left
+LBP_OFFSETS = [(-1, -1), (-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1)]
+
+# SSIM stabilising constants for 8-bit data (K1 = 0.01, K2 = 0.03, L = 255)
+SSIM_C1 = (0.01 * 255) ** 2
+SSIM_C2 = (0.03 * 255) ** 2
+
+
+def _lbp_numpy(gray: np.ndarray) -> tuple:
+    """
+    8-neighbour LBP codes for the interior pixels plus their 256-bin histogram.
+    Each neighbour >= centre sets one bit, built with whole-array compares
+    instead of a per-pixel loop. Returns (codes, hist)
+    """
+    h, w = gray.shape
+    center = gray[1:-1, 1:-1]
+    codes = np.zeros(center.shape, dtype=np.uint8)
+    for bit, (dy, dx) in enumerate(LBP_OFFSETS):
+        neighbour = gray[1 + dy:h - 1 + dy, 1 + dx:w - 1 + dx]
+        codes |= (neighbour >= center).astype(np.uint8) << bit
+    return codes, np.bincount(codes.ravel(), minlength=256)
+
+
+def _lbp_fused(gray):
+    """
+    Same contract as _lbp_numpy, written as one pass for numba: the compares,
+    bit packing and histogram update happen per pixel
+    """
+    h, w = gray.shape
+    codes = np.empty((max(h - 2, 0), max(w - 2, 0)), dtype=np.uint8)
+    hist = np.zeros(256, dtype=np.int64)
+
+    for y in range(1, h - 1):
+        for x in range(1, w - 1):
+            c = gray[y, x]
+            code = 0
+            if gray[y - 1, x - 1] >= c:
+                code |= 1
+            if gray[y - 1, x] >= c:
+                code |= 2
+            if gray[y - 1, x + 1] >= c:
+                code |= 4
+            if gray[y, x + 1] >= c:
+                code |= 8
+            if gray[y + 1, x + 1] >= c:
+                code |= 16
+            if gray[y + 1, x] >= c:
+                code |= 32
+            if gray[y + 1, x - 1] >= c:
+                code |= 64
+            if gray[y, x - 1] >= c:
+                code |= 128
+            codes[y - 1, x - 1] = code
+            hist[code] += 1
+
+    return codes, hist
+
+
+def _block_ssim_numpy(a: np.ndarray, b: np.ndarray, win: int = 8) -> float:
+    """
+    Mean SSIM over non-overlapping win x win blocks of two gray images of the
+    same shape; a partial last row/column of blocks is ignored
+    """
+    win = max(1, min(win, a.shape[0], a.shape[1]))
+    rows, cols = a.shape[0] // win, a.shape[1] // win
+    x = a[:rows * win, :cols * win].astype(np.float64).reshape(rows, win, cols, win)
+    y = b[:rows * win, :cols * win].astype(np.float64).reshape(rows, win, cols, win)
+    mu_x = x.mean(axis=(1, 3))
+    mu_y = y.mean(axis=(1, 3))
+    var_x = x.var(axis=(1, 3))
+    var_y = y.var(axis=(1, 3))
+    cov = (x * y).mean(axis=(1, 3)) - mu_x * mu_y
+    ssim = ((2 * mu_x * mu_y + SSIM_C1) * (2 * cov + SSIM_C2)) / (
+        (mu_x ** 2 + mu_y ** 2 + SSIM_C1) * (var_x + var_y + SSIM_C2))
+    return float(ssim.mean())
+
+
+def _block_ssim_fused(a, b, win):
+    """
+    Same contract as _block_ssim_numpy, written as one pass for numba: each
+    block's sums, squares and cross products are accumulated together
+    """
+    win = max(1, min(win, a.shape[0], a.shape[1]))
+    rows = a.shape[0] // win
+    cols = a.shape[1] // win
+    n = win * win
+    total = 0.0
+
+    for r in range(rows):
+        for c in range(cols):
+            sx = 0.0
+            sy = 0.0
+            sxx = 0.0
+            syy = 0.0
+            sxy = 0.0
+            for y in range(r * win, (r + 1) * win):
+                for x in range(c * win, (c + 1) * win):
+                    u = float(a[y, x])
+                    v = float(b[y, x])
+                    sx += u
+                    sy += v
+                    sxx += u * u
+                    syy += v * v
+                    sxy += u * v
+            mu_x = sx / n
+            mu_y = sy / n
+            var_x = sxx / n - mu_x * mu_x
+            var_y = syy / n - mu_y * mu_y
+            cov = sxy / n - mu_x * mu_y
+            total += ((2 * mu_x * mu_y + SSIM_C1) * (2 * cov + SSIM_C2)) / (
+                (mu_x * mu_x + mu_y * mu_y + SSIM_C1) * (var_x + var_y + SSIM_C2))
+
+    return total / (rows * cols)
+
+
+if NUMBA_AVAILABLE:
+    # Serial kernels: they run on _DIP_POOL threads and overlapping requests,
+    # which already provide the parallelism, and numba's default workqueue
+    # layer aborts on concurrent parallel=True calls
+    _lbp_kernel = njit(cache=True)(_lbp_fused)
+    _block_ssim_kernel = njit(cache=True)(_block_ssim_fused)
+
+    def lbp_histogram(gray: np.ndarray) -> tuple:
+        """Numba LBP codes and histogram (single-threaded, safe to call from several threads)"""
+        return _lbp_kernel(gray)
+
+    def block_ssim(a: np.ndarray, b: np.ndarray, win: int = 8) -> float:
+        """Numba block SSIM (single-threaded, safe to call from several threads)"""
+        return float(_block_ssim_kernel(np.ascontiguousarray(a), np.ascontiguousarray(b), win))
+
+    # Compile now rather than on the first upload
+    lbp_histogram(np.zeros((3, 3), dtype=np.uint8))
+    block_ssim(np.zeros((8, 8), dtype=np.uint8), np.zeros((8, 8), dtype=np.uint8))
+else:
+    lbp_histogram = _lbp_numpy
+    block_ssim = _block_ssim_numpy
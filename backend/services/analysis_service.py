@@ -1,11 +1,95 @@
 """Analysis service for pattern detection and correlation"""
 from typing import List, Dict, Any
 from datetime import datetime, timedelta
-from collections import defaultdict
+from itertools import islice
+from operator import attrgetter
+import heapq
 import numpy as np
-from scipy import stats
+import math
+from functools import lru_cache
 from models import Meal, Symptom
 from schemas import CorrelationAnalysis, DashboardData, TimelineEntry
+from services._corr_kernels import best_lag
+
+_BETACF_MAX_ITER = 200
+_BETACF_EPS = 3e-16
+_BETACF_FPMIN = 1e-300
+
+
+def _betacf(a: float, b: float, x: float):
+    """
+    Continued fraction for the regularized incomplete beta function
+    (modified Lentz's method). Returns None if it does not converge.
+    """
+    qab = a + b
+    qap = a + 1.0
+    qam = a - 1.0
+    c = 1.0
+    d = 1.0 - qab * x / qap
+    if abs(d) < _BETACF_FPMIN:
+        d = _BETACF_FPMIN
+    d = 1.0 / d
+    h = d
+    
+    for m in range(1, _BETACF_MAX_ITER + 1):
+        m2 = 2 * m
+        # Even step
+        aa = m * (b - m) * x / ((qam + m2) * (a + m2))
+        d = 1.0 + aa * d
+        if abs(d) < _BETACF_FPMIN:
+            d = _BETACF_FPMIN
+        c = 1.0 + aa / c
+        if abs(c) < _BETACF_FPMIN:
+            c = _BETACF_FPMIN
+        d = 1.0 / d
+        h *= d * c
+        # Odd step
+        aa = -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))
+        d = 1.0 + aa * d
+        if abs(d) < _BETACF_FPMIN:
+            d = _BETACF_FPMIN
+        c = 1.0 + aa / c
+        if abs(c) < _BETACF_FPMIN:
+            c = _BETACF_FPMIN
+        d = 1.0 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1.0) < _BETACF_EPS:
+            return h
+    
+    return None
+
+
+def _betainc(a: float, b: float, x: float):
+    """Regularized incomplete beta I_x(a, b), or None if it does not converge"""
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    
+    front = math.exp(
+        math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b)
+        + a * math.log(x) + b * math.log1p(-x)
+    )
+    # Use the symmetry I_x(a, b) = 1 - I_{1-x}(b, a) where the fraction converges faster
+    if x < (a + 1.0) / (a + b + 2.0):
+        cf = _betacf(a, b, x)
+        return None if cf is None else front * cf / a
+    cf = _betacf(b, a, 1.0 - x)
+    return None if cf is None else 1.0 - front * cf / b
+
+
+@lru_cache(maxsize=256)
+def _students_t_sf(t: float, df: int):
+    """
+    Survival function P(T > t) of Student's t with df degrees of freedom,
+    or None if the continued fraction does not converge
+    """
+    # P(|T| > |t|) = I_x(df/2, 1/2) with x = df / (df + t^2)
+    two_sided = _betainc(df / 2.0, 0.5, df / (df + t * t))
+    if two_sided is None:
+        return None
+    return 0.5 * two_sided if t >= 0 else 1.0 - 0.5 * two_sided
 
 class AnalysisService:
     """Service for analyzing correlations and patterns"""
@@ -14,6 +98,9 @@ class AnalysisService:
         """Initialize analysis service"""
         # Time lag windows to check (in hours)
         self.time_lag_windows = [1, 2, 3, 4, 6, 8, 12, 24, 48]
+        
+        # scipy is only imported if the built-in t-distribution tail fails
+        self._t_sf = None
     
     def calculate_correlation(self, meals: List[Meal], symptoms: List[Symptom]) -> CorrelationAnalysis:
         """
@@ -21,143 +108,157 @@ class AnalysisService:
         
         This is the core "AI intelligence" that determines if gluten is causing symptoms
         """
+        # Without both kinds of entries (or with fewer than 3 days of data)
+        # the correlation is necessarily zero, so skip building the series
+        if not meals or not symptoms or len(meals) + len(symptoms) < 3:
+            return CorrelationAnalysis(
+                correlation_score=0.0,
+                confidence_level=0.0,
+                significant=False,
+                time_lag_hours=0,
+                dose_response=False
+            )
+        
+        return self._analyze(meals, symptoms)["correlation"]
+    
+    def _analyze(self, meals: List[Meal], symptoms: List[Symptom]) -> Dict[str, Any]:
+        """
+        Run the correlation analysis and return it together with its
+        intermediates (columnar meal/symptom arrays, daily series) so callers
+        that need more statistics reuse them instead of re-walking the data
+        """
+        meal_arrays = self._meals_to_arrays(meals)
+        symptom_arrays = self._symptoms_to_arrays(symptoms)
         
         # Create daily timeseries
-        timeseries = self._create_daily_timeseries(meals, symptoms)
+        gluten_avg, symptom_avg = self._create_daily_timeseries_from_arrays(meal_arrays, symptom_arrays)
         
         # Calculate correlations at different time lags
-        best_correlation, best_lag = self._find_best_time_lag_correlation(timeseries)
+        best_correlation, best_lag = self._find_best_time_lag_correlation(gluten_avg, symptom_avg)
         
         # Dose-response analysis
-        dose_response = self._analyze_dose_response(timeseries)
+        dose_response = self._analyze_dose_response(gluten_avg, symptom_avg)
         
         # Statistical significance
-        p_value = self._calculate_p_value(timeseries, best_correlation)
+        p_value = self._calculate_p_value(len(gluten_avg), best_correlation)
         significant = p_value < 0.05
         confidence_level = 1 - p_value if p_value < 1 else 0.0
         
         # Convert correlation to percentage (0-100)
         correlation_percentage = abs(best_correlation) * 100
         
-        return CorrelationAnalysis(
+        correlation = CorrelationAnalysis(
             correlation_score=round(correlation_percentage, 1),
             confidence_level=round(confidence_level, 3),
             significant=significant,
             time_lag_hours=best_lag,
             dose_response=dose_response
         )
+        
+        return {
+            "meal_arrays": meal_arrays,
+            "symptom_arrays": symptom_arrays,
+            "gluten_avg": gluten_avg,
+            "symptom_avg": symptom_avg,
+            "correlation": correlation
+        }
+    
+    def _timestamps_as_days(self, entries: List[Any]) -> np.ndarray:
+        """Day index (days since the Unix epoch) of each entry's timestamp"""
+        timestamps = np.fromiter((e.timestamp for e in entries), dtype="datetime64[us]", count=len(entries))
+        return timestamps.astype("datetime64[D]").view(np.int64)
+    
+    def _meals_to_arrays(self, meals: List[Meal]) -> Dict[str, np.ndarray]:
+        """Columnar view of meals: day index and gluten risk score"""
+        return {
+            "day": self._timestamps_as_days(meals),
+            "score": np.asarray([m.gluten_risk_score for m in meals], dtype=np.float64)
+        }
+    
+    def _symptoms_to_arrays(self, symptoms: List[Symptom]) -> Dict[str, np.ndarray]:
+        """Columnar view of symptoms: day index and severity"""
+        return {
+            "day": self._timestamps_as_days(symptoms),
+            "score": np.asarray([s.severity for s in symptoms], dtype=np.float64)
+        }
     
-    def _create_daily_timeseries(self, meals: List[Meal], symptoms: List[Symptom]) -> Dict[str, Dict]:
+    def _create_daily_timeseries_from_arrays(self, meal_arrays: Dict[str, np.ndarray],
+                                             symptom_arrays: Dict[str, np.ndarray]) -> tuple:
         """
-        Create daily timeseries of gluten exposure and symptom severity
+        Create daily timeseries from columnar meal/symptom arrays
+        
+        Returns parallel arrays (gluten_avg, symptom_avg) ordered by date,
+        holding one entry per day that has at least one meal or symptom
         """
-        timeseries = defaultdict(lambda: {"gluten_score": 0.0, "symptom_score": 0.0, "meal_count": 0, "symptom_count": 0})
+        meal_days, meal_scores = meal_arrays["day"], meal_arrays["score"]
+        symptom_days, symptom_scores = symptom_arrays["day"], symptom_arrays["score"]
+        
+        if meal_days.size + symptom_days.size == 0:
+            return np.zeros(0), np.zeros(0)
         
-        # Process meals
-        for meal in meals:
-            date_key = meal.timestamp.date().isoformat()
-            timeseries[date_key]["gluten_score"] += meal.gluten_risk_score
-            timeseries[date_key]["meal_count"] += 1
+        # Bucket by day offset from the first logged day
+        all_days = np.concatenate((meal_days, symptom_days))
+        first_day = all_days.min()
+        num_days = int(all_days.max() - first_day) + 1
+        meal_rel = meal_days - first_day
+        symptom_rel = symptom_days - first_day
         
-        # Process symptoms
-        for symptom in symptoms:
-            date_key = symptom.timestamp.date().isoformat()
-            timeseries[date_key]["symptom_score"] += symptom.severity
-            timeseries[date_key]["symptom_count"] += 1
+        gluten_sums = np.bincount(meal_rel, weights=meal_scores, minlength=num_days)
+        meal_counts = np.bincount(meal_rel, minlength=num_days)
+        symptom_sums = np.bincount(symptom_rel, weights=symptom_scores, minlength=num_days)
+        symptom_counts = np.bincount(symptom_rel, minlength=num_days)
         
         # Calculate averages
-        for date_key in timeseries:
-            if timeseries[date_key]["meal_count"] > 0:
-                timeseries[date_key]["gluten_score"] /= timeseries[date_key]["meal_count"]
-            if timeseries[date_key]["symptom_count"] > 0:
-                timeseries[date_key]["symptom_score"] /= timeseries[date_key]["symptom_count"]
+        gluten_avg = np.divide(gluten_sums, meal_counts, out=np.zeros(num_days), where=meal_counts > 0)
+        symptom_avg = np.divide(symptom_sums, symptom_counts, out=np.zeros(num_days), where=symptom_counts > 0)
         
-        return dict(timeseries)
+        # Days without any entries are not part of the series
+        logged = (meal_counts + symptom_counts) > 0
+        return gluten_avg[logged], symptom_avg[logged]
     
-    def _find_best_time_lag_correlation(self, timeseries: Dict[str, Dict]) -> tuple:
+    def _find_best_time_lag_correlation(self, gluten_scores: np.ndarray, symptom_scores: np.ndarray) -> tuple:
         """
         Find the time lag that produces the strongest correlation
         (gluten today → symptoms tomorrow/2 days later/etc.)
         """
-        if len(timeseries) < 3:
-            return 0.0, 0
-        
-        # Sort by date
-        sorted_dates = sorted(timeseries.keys())
-        
-        # Try immediate correlation (same day)
-        gluten_scores = [timeseries[d]["gluten_score"] for d in sorted_dates]
-        symptom_scores = [timeseries[d]["symptom_score"] for d in sorted_dates]
-        
-        if len(gluten_scores) < 3:
+        n = len(gluten_scores)
+        if n < 3:
             return 0.0, 0
         
-        try:
-            correlation, _ = stats.pearsonr(gluten_scores, symptom_scores)
-            if np.isnan(correlation):
-                correlation = 0.0
-        except:
-            correlation = 0.0
-        
-        best_correlation = correlation
-        best_lag = 0
+        # Lag 0 is the same-day correlation; lag N pairs gluten today with
+        # symptoms N days later (each window keeps at least 3 days)
+        best_correlation, best_lag_days = best_lag(gluten_scores, symptom_scores, min(3, n - 3))
         
-        # Try lagged correlations (gluten today → symptoms N days later)
-        for lag_days in range(1, min(4, len(sorted_dates) - 1)):
-            gluten_lagged = gluten_scores[:-lag_days]
-            symptom_lagged = symptom_scores[lag_days:]
-            
-            if len(gluten_lagged) < 3:
-                continue
-            
-            try:
-                corr, _ = stats.pearsonr(gluten_lagged, symptom_lagged)
-                if not np.isnan(corr) and abs(corr) > abs(best_correlation):
-                    best_correlation = corr
-                    best_lag = lag_days * 24  # Convert to hours
-            except:
-                continue
-        
-        return best_correlation, best_lag
+        return best_correlation, best_lag_days * 24  # Convert to hours
     
-    def _analyze_dose_response(self, timeseries: Dict[str, Dict]) -> bool:
+    def _analyze_dose_response(self, gluten_avg: np.ndarray, symptom_avg: np.ndarray) -> bool:
         """
         Check if more gluten = worse symptoms (dose-response relationship)
         """
-        if len(timeseries) < 5:
+        if len(gluten_avg) < 5:
             return False
         
-        # Categorize days by gluten exposure
-        low_gluten_days = []
-        high_gluten_days = []
-        
-        for data in timeseries.values():
-            gluten = data["gluten_score"]
-            symptoms = data["symptom_score"]
-            
-            if symptoms == 0:  # Skip symptom-free days for this analysis
-                continue
-            
-            if gluten < 30:
-                low_gluten_days.append(symptoms)
-            elif gluten >= 70:
-                high_gluten_days.append(symptoms)
+        # Categorize symptomatic days by gluten exposure (symptom-free days
+        # are skipped for this analysis)
+        symptomatic = symptom_avg != 0
+        low_gluten_days = symptomatic & (gluten_avg < 30)
+        high_gluten_days = symptomatic & (gluten_avg >= 70)
+        n_low = np.count_nonzero(low_gluten_days)
+        n_high = np.count_nonzero(high_gluten_days)
         
         # Compare average symptoms
-        if len(low_gluten_days) >= 2 and len(high_gluten_days) >= 2:
-            avg_low = np.mean(low_gluten_days)
-            avg_high = np.mean(high_gluten_days)
+        if n_low >= 2 and n_high >= 2:
+            avg_low = np.sum(symptom_avg, where=low_gluten_days) / n_low
+            avg_high = np.sum(symptom_avg, where=high_gluten_days) / n_high
             
-            return avg_high > avg_low * 1.2  # 20% worse on high gluten days
+            return bool(avg_high > avg_low * 1.2)  # 20% worse on high gluten days
         
         return False
     
-    def _calculate_p_value(self, timeseries: Dict[str, Dict], correlation: float) -> float:
+    def _calculate_p_value(self, n: int, correlation: float) -> float:
         """
-        Calculate statistical significance (p-value)
+        Calculate statistical significance (p-value) for a correlation over n days
         """
-        n = len(timeseries)
-        
         if n < 3:
             return 1.0
         
@@ -166,41 +267,44 @@ class AnalysisService:
             return 0.001 if abs(correlation) == 1 else 1.0
         
         try:
-            t_stat = correlation * np.sqrt((n - 2) / (1 - correlation**2))
-            p_value = 2 * (1 - stats.t.cdf(abs(t_stat), n - 2))
+            t_stat = correlation * math.sqrt((n - 2) / max(1 - correlation * correlation, 1e-12))
+            # Two-sided p-value from the survival function (no 1 - cdf cancellation)
+            tail = _students_t_sf(abs(t_stat), n - 2)
+            if tail is None:
+                tail = self._scipy_t_sf()(abs(t_stat), n - 2)
+            p_value = 2.0 * tail
             return min(p_value, 1.0)
         except:
             return 1.0
     
+    def _scipy_t_sf(self):
+        """scipy's Student-t survival function, imported on first use"""
+        if self._t_sf is None:
+            from scipy.stats import t as t_dist
+            self._t_sf = t_dist.sf
+        return self._t_sf
+    
     def generate_dashboard_data(self, meals: List[Meal], symptoms: List[Symptom]) -> DashboardData:
         """
         Generate summary data for dashboard
         """
-        # Count unique days with gluten exposure
-        gluten_days = set()
-        symptom_days = set()
-        
-        gluten_scores = []
-        symptom_severities = []
-        
-        for meal in meals:
-            if meal.gluten_risk_score >= 70:  # High gluten
-                gluten_days.add(meal.timestamp.date())
-            gluten_scores.append(meal.gluten_risk_score)
+        # Columnar meal/symptom data shared by every statistic below
+        meal_arrays = self._meals_to_arrays(meals)
+        symptom_arrays = self._symptoms_to_arrays(symptoms)
         
-        for symptom in symptoms:
-            symptom_days.add(symptom.timestamp.date())
-            symptom_severities.append(symptom.severity)
+        # Count unique days with gluten exposure
+        gluten_days = np.unique(meal_arrays["day"][meal_arrays["score"] >= 70]).size  # High gluten
+        symptom_days = np.unique(symptom_arrays["day"]).size
         
         # Calculate averages
-        avg_gluten_risk = np.mean(gluten_scores) if gluten_scores else 0.0
-        avg_symptom_severity = np.mean(symptom_severities) if symptom_severities else 0.0
+        avg_gluten_risk = meal_arrays["score"].mean() if meal_arrays["score"].size else 0.0
+        avg_symptom_severity = symptom_arrays["score"].mean() if symptom_arrays["score"].size else 0.0
         
         # Quick correlation preview
         correlation_preview = None
         if len(meals) >= 10 and len(symptoms) >= 10:
-            timeseries = self._create_daily_timeseries(meals, symptoms)
-            correlation, _ = self._find_best_time_lag_correlation(timeseries)
+            gluten_avg, symptom_avg = self._create_daily_timeseries_from_arrays(meal_arrays, symptom_arrays)
+            correlation, _ = self._find_best_time_lag_correlation(gluten_avg, symptom_avg)
             correlation_preview = abs(correlation) * 100
         
         # Create recent timeline
@@ -209,53 +313,71 @@ class AnalysisService:
         return DashboardData(
             total_meals=len(meals),
             total_symptoms=len(symptoms),
-            gluten_exposure_days=len(gluten_days),
-            symptom_days=len(symptom_days),
+            gluten_exposure_days=gluten_days,
+            symptom_days=symptom_days,
             avg_gluten_risk=round(avg_gluten_risk, 1),
             avg_symptom_severity=round(avg_symptom_severity, 1),
             correlation_preview=round(correlation_preview, 1) if correlation_preview else None,
             recent_timeline=recent_timeline
         )
     
-    def _create_recent_timeline(self, meals: List[Meal], symptoms: List[Symptom], days: int) -> List[TimelineEntry]:
-        """Create recent timeline entries"""
+    def _create_recent_timeline(self, meals: List[Meal], symptoms: List[Symptom], days: int,
+                                limit: int = 20) -> List[TimelineEntry]:
+        """Create recent timeline entries (most recent first)"""
         cutoff = datetime.utcnow() - timedelta(days=days)
-        timeline = []
-        
-        for meal in meals:
-            if meal.timestamp >= cutoff:
-                timeline.append(TimelineEntry(
-                    timestamp=meal.timestamp,
-                    entry_type="meal",
-                    description=meal.description[:100] if meal.description else "",
-                    detailed_description=getattr(meal, 'detailed_description', None),
-                    gluten_risk=meal.gluten_risk_score,
-                    severity=None
-                ))
-        
-        for symptom in symptoms:
-            if symptom.timestamp >= cutoff:
-                timeline.append(TimelineEntry(
-                    timestamp=symptom.timestamp,
-                    entry_type="symptom",
-                    description=symptom.description[:100] if symptom.description else "",
-                    detailed_description=None,  # Symptoms don't have detailed descriptions
-                    gluten_risk=None,
-                    severity=symptom.severity
-                ))
-        
-        # Sort by timestamp (most recent first)
-        timeline.sort(key=lambda x: x.timestamp, reverse=True)
-        
-        return timeline[:20]  # Return last 20 entries
+        
+        # Only the newest `limit` entries of each kind can make the cut, so
+        # entries are built lazily while merging the two newest-first lists
+        meal_entries = (self._meal_timeline_entry(m) for m in self._newest_since(meals, cutoff, limit))
+        symptom_entries = (self._symptom_timeline_entry(s) for s in self._newest_since(symptoms, cutoff, limit))
+        merged = heapq.merge(meal_entries, symptom_entries, key=attrgetter("timestamp"), reverse=True)
+        
+        return list(islice(merged, limit))
+    
+    def _newest_since(self, entries: List[Any], cutoff: datetime, limit: int) -> List[Any]:
+        """Up to `limit` entries with timestamp >= cutoff, newest first"""
+        if not entries:
+            return []
+        
+        timestamps = np.array([e.timestamp for e in entries], dtype="datetime64[us]").view(np.int64)
+        order = np.argsort(-timestamps, kind="stable")
+        
+        # Entries at or after the cutoff form a prefix of the newest-first order
+        cutoff_us = np.datetime64(cutoff, "us").view(np.int64)
+        num_recent = int(np.searchsorted(-timestamps[order], -cutoff_us, side="right"))
+        
+        return [entries[i] for i in order[:min(num_recent, limit)]]
+    
+    def _meal_timeline_entry(self, meal: Meal) -> TimelineEntry:
+        """Timeline entry for a meal"""
+        return TimelineEntry(
+            timestamp=meal.timestamp,
+            entry_type="meal",
+            description=meal.short_description,
+            detailed_description=getattr(meal, 'detailed_description', None),
+            gluten_risk=meal.gluten_risk_score,
+            severity=None
+        )
+    
+    def _symptom_timeline_entry(self, symptom: Symptom) -> TimelineEntry:
+        """Timeline entry for a symptom"""
+        return TimelineEntry(
+            timestamp=symptom.timestamp,
+            entry_type="symptom",
+            description=symptom.short_description,
+            detailed_description=None,  # Symptoms don't have detailed descriptions
+            gluten_risk=None,
+            severity=symptom.severity
+        )
     
     def generate_report(self, meals: List[Meal], symptoms: List[Symptom], 
                        start_date: datetime, end_date: datetime) -> Dict[str, Any]:
         """
         Generate comprehensive analysis report
         """
-        # Calculate correlation
-        correlation = self.calculate_correlation(meals, symptoms)
+        # Calculate correlation (keeping the intermediates for the stats below)
+        analysis = self._analyze(meals, symptoms)
+        correlation = analysis["correlation"]
         
         # Determine if gluten intolerance detected
         gluten_intolerance = (
@@ -267,7 +389,7 @@ class AnalysisService:
         symptom_summary = self._summarize_symptoms(symptoms)
         
         # Meal summary
-        meal_summary = self._summarize_meals(meals)
+        meal_summary = self._summarize_meals(analysis["meal_arrays"]["score"])
         
         # Pattern analysis
         pattern_analysis = {
@@ -280,8 +402,9 @@ class AnalysisService:
         recommendations = self._generate_recommendations(correlation, gluten_intolerance)
         
         # Calculate stats
-        gluten_days = len(set(m.timestamp.date() for m in meals if m.gluten_risk_score >= 70))
-        symptom_days = len(set(s.timestamp.date() for s in symptoms))
+        meal_arrays = analysis["meal_arrays"]
+        gluten_days = np.unique(meal_arrays["day"][meal_arrays["score"] >= 70]).size
+        symptom_days = np.unique(analysis["symptom_arrays"]["day"]).size
         total_days = (end_date - start_date).days
         symptom_free_days = total_days - symptom_days
         
@@ -301,31 +424,40 @@ class AnalysisService:
     
     def _summarize_symptoms(self, symptoms: List[Symptom]) -> Dict[str, Any]:
         """Summarize symptoms by type and severity"""
-        symptom_types = defaultdict(list)
-        
-        for symptom in symptoms:
-            symptom_types[symptom.symptom_type or "general"].append(symptom.severity)
-        
+        if not symptoms:
+            return {}
+        
+        types = np.array([s.symptom_type or "general" for s in symptoms])
+        severities = np.asarray([s.severity for s in symptoms], dtype=np.float64)
+        
+        # Group severities by type: sort by type code, then reduce each run
+        type_names, first_seen, codes = np.unique(types, return_index=True, return_inverse=True)
+        order = np.argsort(codes, kind="stable")
+        sorted_codes = codes[order]
+        sorted_severities = severities[order]
+        breaks = np.concatenate(([0], np.flatnonzero(np.diff(sorted_codes)) + 1))
+        counts = np.diff(np.append(breaks, len(sorted_codes)))
+        sums = np.add.reduceat(sorted_severities, breaks)
+        maxes = np.maximum.reduceat(sorted_severities, breaks)
+        
+        # Report types in the order they first appear
         summary = {}
-        for symptom_type, severities in symptom_types.items():
-            summary[symptom_type] = {
-                "count": len(severities),
-                "avg_severity": round(np.mean(severities), 1),
-                "max_severity": round(max(severities), 1)
+        for code in np.argsort(first_seen):
+            summary[str(type_names[code])] = {
+                "count": int(counts[code]),
+                "avg_severity": round(sums[code] / counts[code], 1),
+                "max_severity": round(float(maxes[code]), 1)
             }
         
         return summary
     
-    def _summarize_meals(self, meals: List[Meal]) -> Dict[str, Any]:
-        """Summarize meal data"""
-        high_gluten_meals = [m for m in meals if m.gluten_risk_score >= 70]
-        low_gluten_meals = [m for m in meals if m.gluten_risk_score < 30]
-        
+    def _summarize_meals(self, gluten_scores: np.ndarray) -> Dict[str, Any]:
+        """Summarize meal data from the per-meal gluten risk scores"""
         return {
-            "total_meals": len(meals),
-            "high_gluten_meals": len(high_gluten_meals),
-            "low_gluten_meals": len(low_gluten_meals),
-            "avg_gluten_risk": round(np.mean([m.gluten_risk_score for m in meals]), 1)
+            "total_meals": int(gluten_scores.size),
+            "high_gluten_meals": int(np.count_nonzero(gluten_scores >= 70)),
+            "low_gluten_meals": int(np.count_nonzero(gluten_scores < 30)),
+            "avg_gluten_risk": round(gluten_scores.mean(), 1) if gluten_scores.size else 0.0
         }
     
     def _generate_recommendations(self, correlation: CorrelationAnalysis, 